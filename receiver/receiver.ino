@@ -17,11 +17,16 @@ struct SensorData {
   float z;
 };
 
-// Global variable to hold the latest data
+// Global variable to hold the latest data (only touched from loop)
 SensorData latestData;
 
-// Volatile flag to indicate new data is ready (for display updates)
-volatile bool newDataAvailable = false;
+// Bounded queue between the ESP-NOW callback and loop(); drops the oldest
+// sample when full so the callback never waits on USB serial
+const uint8_t RX_QUEUE_SIZE = 16;
+SensorData rxQueue[RX_QUEUE_SIZE];
+uint8_t rxHead = 0; // next slot to write
+uint8_t rxTail = 0; // next slot to read
+portMUX_TYPE rxMux = portMUX_INITIALIZER_UNLOCKED;
 
 // Receiver MAC address (printed and shown on TFT)
 String macAddress;
@@ -40,18 +45,32 @@ String getStaMac() {
 
 
 // --- ESP-NOW Receive Callback ---
-// Kept fast: just copies data and sets a flag.
+// Kept fast: just queues the sample. Serial output and display updates
+// happen in loop so the Wi-Fi task is never blocked on USB.
 void onReceive(const esp_now_recv_info_t *info, const uint8_t *incomingData, int len) {
   if (len != sizeof(SensorData)) {
     return;
   }
-  memcpy(&latestData, incomingData, sizeof(latestData));
-  // Update display in loop to keep callback fast
-  newDataAvailable = true;
+  portENTER_CRITICAL(&rxMux);
+  memcpy(&rxQueue[rxHead], incomingData, sizeof(SensorData));
+  rxHead = (rxHead + 1) % RX_QUEUE_SIZE;
+  if (rxHead == rxTail) {
+    rxTail = (rxTail + 1) % RX_QUEUE_SIZE; // full: drop oldest
+  }
+  portEXIT_CRITICAL(&rxMux);
+}
 
-  // Send data to USB Serial in JSON format for Python script to parse
-  Serial.printf("{\"x\":%.2f,\"y\":%.2f,\"z\":%.2f}\n", 
-                latestData.x, latestData.y, latestData.z);
+// Pop the oldest queued sample; returns false if the queue is empty
+bool popSample(SensorData &out) {
+  bool available = false;
+  portENTER_CRITICAL(&rxMux);
+  if (rxTail != rxHead) {
+    out = rxQueue[rxTail];
+    rxTail = (rxTail + 1) % RX_QUEUE_SIZE;
+    available = true;
+  }
+  portEXIT_CRITICAL(&rxMux);
+  return available;
 }
 
 // --- Display Update Function ---
@@ -118,9 +137,18 @@ void setup() {
 
 // --- Main Loop ---
 void loop() {
-  // If new data arrived, update the screen.
+  // Drain queued samples to USB Serial in JSON format for the Python server
+  SensorData sample;
+  bool newDataAvailable = false;
+  while (popSample(sample)) {
+    Serial.printf("{\"x\":%.2f,\"y\":%.2f,\"z\":%.2f}\n",
+                  sample.x, sample.y, sample.z);
+    latestData = sample;
+    newDataAvailable = true;
+  }
+
+  // If new data arrived, update the screen once with the latest sample.
   if (newDataAvailable) {
-    newDataAvailable = false;
     updateDisplay();
   }
 
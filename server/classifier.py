@@ -1,3 +1,4 @@
+import math
 from enum import StrEnum
 
 import numpy as np
@@ -8,6 +9,93 @@ class SensorMode(StrEnum):
     NDOF = "Nine degree of freedom Kalman filter"
 
 
+_I3 = np.eye(3)
+
+# Covariance blocks (p_gg, p_ga, p_aa) at construction/reset and after gravity init
+_P_INIT = (1.0, 0.0, 1.0)
+_P_GRAVITY_INIT = (0.1, 0.0, 1.0)
+
+
+def _kf_run(
+    zs: np.ndarray,
+    x: list[float],
+    P: tuple[float, float, float],
+    phi: float,
+    qg_d: float,
+    qa_d: float,
+    r: float,
+    out: np.ndarray | None = None,
+) -> tuple[list[float], tuple[float, float, float], float]:
+    """
+    Closed-form LinearAccelerationKF recurrence over a window of samples.
+
+    Runs on plain Python floats: for 3-vectors and a scalar covariance the
+    per-call overhead of NumPy costs far more than the arithmetic itself.
+
+    Parameters:
+        zs: (N, 3) array of acceleration measurements (m/s²)
+        x: 6-element state [g_bx, g_by, g_bz, a_lx, a_ly, a_lz]
+        P: covariance blocks (p_gg, p_ga, p_aa)
+        phi: acceleration decay per step
+        qg_d: discrete gravity process noise
+        qa_d: discrete acceleration process noise
+        r: measurement noise variance
+        out: Optional (N, 3) array that receives the linear acceleration estimates
+
+    Returns:
+        (x_out, P_out, acc_sum): Final state and covariance blocks, and the sum
+        of the linear acceleration magnitudes over the window
+    """
+    gx, gy, gz, ax, ay, az = x
+    p_gg, p_ga, p_aa = P
+    rows: list[tuple[float, float, float]] = []
+    acc_sum = 0.0
+
+    for zx, zy, zz in zs.tolist():
+        # Predict: x = F x, P = F P F^T + Q
+        ax *= phi
+        ay *= phi
+        az *= phi
+        p_gg += qg_d
+        p_ga *= phi
+        p_aa = phi * phi * p_aa + qa_d
+
+        # Update
+        s = p_gg + 2.0 * p_ga + p_aa + r  # innovation covariance (H P H^T + R)
+        # Kalman gain K = P H^T S^-1 = [k_g I, k_a I]^T
+        k_g = (p_gg + p_ga) / s
+        k_a = (p_ga + p_aa) / s
+
+        yx = zx - gx - ax  # innovation
+        yy = zy - gy - ay
+        yz = zz - gz - az
+        gx += k_g * yx
+        gy += k_g * yy
+        gz += k_g * yz
+        ax += k_a * yx
+        ay += k_a * yy
+        az += k_a * yz
+        acc_sum += math.sqrt(ax * ax + ay * ay + az * az)
+        if out is not None:
+            rows.append((ax, ay, az))
+
+        # Joseph form covariance update (ensures positive-definiteness):
+        # P = L P L^T + r K K^T with L = I - K H = [[1 - k_g, -k_g], [-k_a, 1 - k_a]]
+        lg_g, lg_a = 1.0 - k_g, -k_g
+        la_g, la_a = -k_a, 1.0 - k_a
+        lp_gg = lg_g * p_gg + lg_a * p_ga
+        lp_ga = lg_g * p_ga + lg_a * p_aa
+        lp_ag = la_g * p_gg + la_a * p_ga
+        lp_aa = la_g * p_ga + la_a * p_aa
+        p_gg = lp_gg * lg_g + lp_ga * lg_a + r * k_g * k_g
+        p_ga = lp_gg * la_g + lp_ga * la_a + r * k_g * k_a
+        p_aa = lp_ag * la_g + lp_aa * la_a + r * k_a * k_a
+
+    if rows:
+        out[:] = rows
+    return [gx, gy, gz, ax, ay, az], (p_gg, p_ga, p_aa), acc_sum
+
+
 class LinearAccelerationKF:
     """
     Estimate gravity and linear acceleration from accelerometer-only data
@@ -16,6 +104,10 @@ class LinearAccelerationKF:
     State: [g_bx, g_by, g_bz, a_lx, a_ly, a_lz]
     - g_b: gravity vector in body frame (constant over short windows)
     - a_l: linear acceleration (AR(1) process with decay phi)
+
+    F, H, Q, R and the initial covariance are all built from 3x3 blocks that
+    are scalar multiples of I3, so every 3x3 block of P stays isotropic and
+    the covariance is tracked as three scalars (p_gg, p_ga, p_aa).
     """
 
     def __init__(
@@ -44,33 +136,21 @@ class LinearAccelerationKF:
         qg = qg_base * (100.0 / fs)
         qa = qa_base
 
-        # State transition matrix
-        self.F = np.block(
-            [
-                [np.eye(3), np.zeros((3, 3))],  # gravity stays constant
-                [np.zeros((3, 3)), self.phi * np.eye(3)],  # acceleration decays
-            ]
-        )
-
-        # Measurement matrix: z = g + a_lin
-        self.H = np.hstack([np.eye(3), np.eye(3)])
+        # The model matrices are never materialized:
+        # F = [[I, 0], [0, phi*I]]  (gravity stays constant, acceleration decays)
+        # H = [I, I]                (z = g + a_lin)
+        # Q = diag(qg_d*I, qa_d*I), R = r*I
 
-        # Process noise covariance (discrete-time)
-        qg_d = qg * self.dt  # gravity random walk
-        qa_d = qa * (1.0 - self.phi**2)  # AR(1) steady-state variance
-        self.Q = np.diag([qg_d, qg_d, qg_d, qa_d, qa_d, qa_d])
+        # Process noise (discrete-time)
+        self.qg_d = qg * self.dt  # gravity random walk
+        self.qa_d = qa * (1.0 - self.phi**2)  # AR(1) steady-state variance
 
-        # Measurement noise covariance
-        self.R = np.eye(3) * r
+        # Measurement noise variance
+        self.r = float(r)
 
-        # State and covariance
-        self.x = np.zeros(6)
-        self.P = np.eye(6)
-
-        # Pre-compute constants for efficiency
-        self._I6 = np.eye(6)
-        self._FT = self.F.T
-        self._HT = self.H.T
+        # State and covariance blocks (P = [[p_gg, p_ga], [p_ga, p_aa]] ⊗ I3)
+        self.x = np.zeros(6, dtype=np.float32)
+        self._p_gg, self._p_ga, self._p_aa = _P_INIT
 
     def initialize_gravity(self, accel_samples: np.ndarray) -> None:
         """
@@ -83,7 +163,15 @@ class LinearAccelerationKF:
         self.x[:3] = g0
         self.x[3:] = 0.0  # linear acceleration starts at zero
         # Lower initial uncertainty after initialization
-        self.P = np.diag([0.1, 0.1, 0.1, 1.0, 1.0, 1.0])
+        self._p_gg, self._p_ga, self._p_aa = _P_GRAVITY_INIT
+
+    @property
+    def P(self) -> np.ndarray:
+        """Full 6x6 state covariance."""
+        return np.kron(
+            np.array([[self._p_gg, self._p_ga], [self._p_ga, self._p_aa]]),
+            _I3,
+        )
 
     def update(self, z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
@@ -93,37 +181,69 @@ class LinearAccelerationKF:
             z: 3-element acceleration measurement (m/s²)
 
         Returns:
-            (g_est, a_lin_est): Estimated gravity and linear acceleration vectors
+            (g_est, a_lin_est): Estimated gravity and linear acceleration vectors.
+                These are views into the filter state and are overwritten by the
+                next update; copy them if they need to be kept.
         """
-        # Predict
-        x_pred = self.F @ self.x
-        P_pred = self.F @ self.P @ self._FT + self.Q
+        self._run(np.reshape(z, (1, 3)))
+        return self.x[:3], self.x[3:]
 
-        # Update
-        y = z - self.H @ x_pred  # innovation
-        S = self.H @ P_pred @ self._HT + self.R  # innovation covariance
-        # Kalman gain (numerically stable using solve)
-        K = (P_pred @ self._HT @ np.linalg.inv(S)).astype(np.float64)
+    def filter(self, zs: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Run the filter over a window of samples.
+
+        Parameters:
+            zs: (N, 3) array of acceleration measurements (m/s²)
+            out: Optional preallocated (N, 3) array for the result
+
+        Returns:
+            (N, 3) array of linear acceleration estimates, one per sample
+        """
+        if out is None:
+            out = np.empty((len(zs), 3), dtype=np.float32)
+        self._run(zs, out)
+        return out
 
-        self.x = x_pred + K @ y
-        # Joseph form covariance update (ensures positive-definiteness)
-        IKH = self._I6 - K @ self.H
-        self.P = IKH @ P_pred @ IKH.T + K @ self.R @ K.T
+    def mean_linear_accel(self, zs: np.ndarray) -> float:
+        """
+        Run the filter over a window and return the mean linear acceleration.
 
-        return self.x[:3].copy(), self.x[3:].copy()
+        Parameters:
+            zs: (N, 3) array of acceleration measurements (m/s²)
+
+        Returns:
+            Mean magnitude of the linear acceleration estimates (m/s²)
+        """
+        return self._run(zs) / len(zs)
+
+    def _run(self, zs: np.ndarray, out: np.ndarray | None = None) -> float:
+        """Advance the filter state over zs; returns the summed |a_lin|."""
+        x, P, acc_sum = _kf_run(
+            zs,
+            self.x.tolist(),
+            (self._p_gg, self._p_ga, self._p_aa),
+            self.phi,
+            self.qg_d,
+            self.qa_d,
+            self.r,
+            out,
+        )
+        self.x[:] = x
+        self._p_gg, self._p_ga, self._p_aa = P
+        return acc_sum
 
     def get_state(self) -> dict[str, np.ndarray]:
         """Return current filter state."""
         return {
             "gravity": self.x[:3].copy(),
             "linear_accel": self.x[3:].copy(),
-            "covariance": self.P.copy(),
+            "covariance": self.P,
         }
 
     def reset(self) -> None:
         """Reset filter to initial state."""
-        self.x = np.zeros(6)
-        self.P = np.eye(6)
+        self.x.fill(0.0)
+        self._p_gg, self._p_ga, self._p_aa = _P_INIT
 
 
 class ActivityClassifier:
@@ -144,6 +264,18 @@ class ActivityClassifier:
         # Lazily created Kalman filter for accelerometer-only mode
         self._kf: LinearAccelerationKF | None = None
 
+    @property
+    def sensor_mode(self) -> SensorMode:
+        """Sensor fusion mode of the incoming samples."""
+        return self._sensor_mode
+
+    @sensor_mode.setter
+    def sensor_mode(self, mode: SensorMode) -> None:
+        self._sensor_mode = mode
+        # Cached so classify() branches on a bool instead of a string compare
+        self._acconly = mode == SensorMode.ACCONLY
+        self._ndof = mode == SensorMode.NDOF
+
     def classify(self, data: np.ndarray) -> dict[str, str | float]:
         """Classify activity level based on a window of acceleration samples.
 
@@ -158,7 +290,7 @@ class ActivityClassifier:
 
         """
 
-        arr = np.asarray(data, dtype=float)
+        arr = np.asarray(data, dtype=np.float32)
         if arr.ndim == 1:
             if arr.size != 3:
                 raise ValueError("Expected a 3-vector or an (N,3) array of samples")
@@ -166,26 +298,20 @@ class ActivityClassifier:
         if arr.shape[1] != 3:
             raise ValueError("Input must have shape (N, 3)")
 
-        if self.sensor_mode == SensorMode.ACCONLY:
+        if self._acconly:
             # Use a lightweight 6-state Kalman filter to separate gravity and linear acceleration.
             if self._kf is None:
                 self._kf = LinearAccelerationKF(fs=self.fs)
                 # Initialize gravity estimate using the first window (assumed roughly stationary on average)
                 self._kf.initialize_gravity(arr)
 
-            dyn_list: list[np.ndarray] = []
-            for z in arr:
-                _, a_lin = self._kf.update(z)
-                dyn_list.append(a_lin)
-            dynamic = np.vstack(dyn_list)
-        elif self.sensor_mode == SensorMode.NDOF:
-            dynamic = arr
+            mean_acc = self._kf.mean_linear_accel(arr)
+        elif self._ndof:
+            # Mean magnitude of dynamic acceleration (m/s^2)
+            mean_acc = float(np.sqrt(np.einsum("ij,ij->i", arr, arr)).mean())
         else:
             raise ValueError(f"Unsupported sensor mode: {self.sensor_mode}")
 
-        # Mean magnitude of dynamic acceleration (m/s^2)
-        mean_acc = float(np.mean(np.linalg.norm(dynamic, axis=1)))
-
         if mean_acc < self.rest_threshold:
             return {"activity": "resting", "mean_acc": mean_acc}
         elif mean_acc < self.active_threshold:
@@ -6,24 +6,107 @@ Reads JSON sensor data from USB serial port and pushes to InfluxDB.
 import argparse
 import json
 import logging
+import math
 import os
+import queue
+import re
+import select
 import sys
+import threading
 import time
 
+import httpx
 import serial
 import serial.tools.list_ports
-from dotenv import load_dotenv
 
-from server.push import push_to_influxdb
+# server.push loads .env on import; reuse its settings instead of parsing it again
+from server.push import (
+    INFLUXDB_BUCKET,
+    INFLUXDB_ORG,
+    INFLUXDB_TOKEN,
+    INFLUXDB_URL,
+    line_protocol_formatter,
+    line_protocol_prefix,
+    write_to_influxdb,
+)
 
-load_dotenv()
-
-INFLUXDB_URL = os.getenv("INFLUXDB_URL", "http://localhost:8086")
-INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "home")
-INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "dazzo")
-INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "")
 SENSOR_NAME = os.getenv("SENSOR_NAME", "feather-receiver")
 
+# InfluxDB write batching: flush after this many samples or this much time (ns)
+BATCH_SIZE = 500
+FLUSH_INTERVAL_NS = 1_000_000_000
+
+# Retries per flush for transient InfluxDB errors, with exponential backoff (s)
+RETRY_MAX = 3
+RETRY_INTERVAL = 0.5
+
+# Batches waiting for the InfluxDB writer thread; the oldest is dropped when full
+WRITE_QUEUE_SIZE = 8
+WRITER_JOIN_TIMEOUT = 5.0  # seconds to wait for pending writes on shutdown
+
+# Most samples kept for a later flush while InfluxDB writes keep failing
+MAX_PENDING = 10 * BATCH_SIZE
+
+# Post a zero sample once no data has arrived for this long (ns)
+IDLE_NS = 1_000_000_000
+
+# Fields every sample from the receiver must carry
+REQUIRED_FIELDS = ("x", "y", "z")
+
+# Fast path for the receiver's fixed {"x":..,"y":..,"z":..} format: the numbers
+# are copied into line protocol as-is, without a JSON round-trip
+_NUM = rb"(-?\d+(?:\.\d+)?)"
+SAMPLE_RE = re.compile(
+    rb'\{"x":' + _NUM + rb',"y":' + _NUM + rb',"z":' + _NUM + rb"\}\s*"
+)
+
+
+class RxBuffer:
+    """
+    Accumulate raw serial bytes and split them into lines.
+
+    Consumed bytes are skipped with a cursor and only compacted once they make
+    up more than half of the buffer, so popping a line does not shift the rest
+    of the buffer every time. The newline search resumes where the previous
+    miss left off, so a partial line is never rescanned.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._start = 0
+        self._scan_pos = 0
+
+    def extend(self, data: bytes) -> None:
+        """Append newly received bytes."""
+        self._buf += data
+
+    def pop_line(self) -> bytearray | None:
+        """Return the next complete line without its newline, or None."""
+        idx = self._buf.find(b"\n", self._scan_pos)
+        if idx < 0:
+            self._scan_pos = len(self._buf)
+            return None
+        line = self._buf[self._start : idx]  # one copy; callers decode directly
+        self._start = self._scan_pos = idx + 1
+        if self._start > len(self._buf) >> 1:
+            del self._buf[: self._start]
+            self._start = self._scan_pos = 0
+        return line
+
+
+def _decode(raw: bytes | bytearray) -> str:
+    """Decode a raw serial line for logging."""
+    return raw.decode("utf-8", errors="replace").strip()
+
+
+def _is_number(value: object) -> bool:
+    """Return True if value is a finite int or float (bools don't count)."""
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and (isinstance(value, int) or math.isfinite(value))
+    )
+
 
 def find_esp32_port() -> str | None:
     """Auto-detect ESP32 device by manufacturer 'Adafruit' or description containing 'ESP32'."""
@@ -34,12 +117,12 @@ def find_esp32_port() -> str | None:
         description = (port.description or "").strip()
 
         if manufacturer == "Adafruit":
-            logging.info(f"Found ESP32 device: {port.device} ({description})")
+            logging.info("Found ESP32 device: %s (%s)", port.device, description)
             return port.device
 
         if "esp32" in description.lower():
             logging.info(
-                f"Found ESP32 device by description: {port.device} ({description})"
+                "Found ESP32 device by description: %s (%s)", port.device, description
             )
             return port.device
 
@@ -62,120 +145,274 @@ def list_serial_ports() -> None:
         print()
 
 
+def _write_with_retry(lines: list[bytes]) -> bool:
+    """
+    Write lines in one request, retrying transient failures.
+
+    Return False only if every attempt hit a retryable error (5xx, 429 or a
+    transport error); a batch InfluxDB rejects outright is logged and
+    reported as done, since resending it can't succeed.
+    """
+    body = b"\n".join(lines)
+    for attempt in range(RETRY_MAX):
+        if attempt:
+            time.sleep(RETRY_INTERVAL * 2 ** (attempt - 1))
+        try:
+            write_to_influxdb(
+                body,
+                bucket=INFLUXDB_BUCKET,
+                org=INFLUXDB_ORG,
+                token=INFLUXDB_TOKEN,
+                influxdb_url=INFLUXDB_URL,
+            )
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status < 500 and status != 429:
+                logging.error("InfluxDB rejected %d samples: %s", len(lines), e)
+                return True
+            error: Exception = e
+        except httpx.TransportError as e:
+            error = e
+        except Exception as e:
+            logging.error("Failed to push to InfluxDB: %s", e)
+            return True
+        else:
+            logging.debug("Pushed %d samples to InfluxDB", len(lines))
+            return True
+
+    logging.error(
+        "Failed to push %d samples to InfluxDB after %d attempts: %s",
+        len(lines),
+        RETRY_MAX,
+        error,
+    )
+    return False
+
+
+def flush_to_influxdb(buf: list[bytes], unsent: list[bytes]) -> None:
+    """
+    Write all buffered samples to InfluxDB, resending earlier failures first.
+
+    buf is always cleared. Samples whose attempts all failed are kept in
+    unsent (at most MAX_PENDING of the newest) for the next flush. The unsent
+    backlog is written in its own request, so a rejected new batch never takes
+    the backlog down with it.
+    """
+    if unsent:
+        backlog = unsent.copy()
+        unsent.clear()
+        if not _write_with_retry(backlog):
+            # Still unreachable; don't spend another round of retries on buf
+            unsent.extend(backlog)
+            unsent.extend(buf)
+            buf.clear()
+            _trim_unsent(unsent)
+            return
+    if buf and not _write_with_retry(buf):
+        unsent.extend(buf)
+        _trim_unsent(unsent)
+    buf.clear()
+
+
+def _trim_unsent(unsent: list[bytes]) -> None:
+    """Keep only the newest MAX_PENDING unsent samples."""
+    if len(unsent) > MAX_PENDING:
+        logging.warning("Dropped %d oldest unsent samples", len(unsent) - MAX_PENDING)
+        del unsent[:-MAX_PENDING]
+
+
+def influxdb_writer(q: queue.Queue[list[bytes] | None]) -> None:
+    """Write batches from q to InfluxDB until a None sentinel arrives."""
+    unsent: list[bytes] = []
+    while (batch := q.get()) is not None:
+        flush_to_influxdb(batch, unsent)
+    flush_to_influxdb([], unsent)
+
+
+def queue_batch(q: queue.Queue[list[bytes] | None], buf: list[bytes]) -> None:
+    """Hand the buffered samples to the writer thread and clear the buffer."""
+    if not buf:
+        return
+    batch = buf.copy()
+    buf.clear()
+    try:
+        q.put_nowait(batch)
+    except queue.Full:
+        try:
+            dropped = q.get_nowait()
+            logging.warning(
+                "InfluxDB writer is behind; dropped %d queued samples", len(dropped)
+            )
+        except queue.Empty:
+            pass
+        q.put_nowait(batch)
+
+
+def _seconds_until(*deadlines_ns: int | None) -> float | None:
+    """Return the seconds until the earliest monotonic_ns deadline, or None if none is set."""
+    pending = [d for d in deadlines_ns if d is not None]
+    if not pending:
+        return None
+    return max(0.0, (min(pending) - time.monotonic_ns()) / 1e9)
+
+
 def process_serial_data(
     port: str,
     baudrate: int = 115200,
     sensor_name: str = SENSOR_NAME,
     push_to_influx: bool = True,
+    strict: bool = False,
 ) -> None:
-    """Read JSON data from serial port and push to InfluxDB."""
+    """Read JSON data from serial port and push to InfluxDB in batches.
+
+    With strict, every sample goes through json.loads instead of the
+    SAMPLE_RE fast path.
+    """
 
     if push_to_influx and not INFLUXDB_TOKEN:
         logging.warning("INFLUXDB_TOKEN not set. InfluxDB push disabled.")
         push_to_influx = False
 
     ser = None
+    # Pending line protocol, one entry per sample, timestamped when it was read
+    buf: list[bytes] = []
+    # Writes run on a background thread so slow requests never stall serial reads
+    write_q: queue.Queue[list[bytes] | None] = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    writer = None
+    if push_to_influx:
+        writer = threading.Thread(target=influxdb_writer, args=(write_q,), daemon=True)
+        writer.start()
     try:
         ser = serial.Serial(port, baudrate, timeout=1)
-        logging.info(f"Connected to {port} at {baudrate} baud")
-        logging.info(f"Sensor name: {sensor_name}")
+        logging.info("Connected to %s at %d baud", port, baudrate)
+        logging.info("Sensor name: %s", sensor_name)
         if push_to_influx:
-            logging.info(f"Pushing to InfluxDB: {INFLUXDB_URL}")
+            logging.info("Pushing to InfluxDB: %s", INFLUXDB_URL)
         else:
             logging.info("InfluxDB push disabled (monitoring mode)")
 
-        # Discard initial incomplete line
+        # Discard initial incomplete line, then switch to non-blocking reads;
+        # the loop below waits in select() instead of the serial timeout
         ser.readline()
+        ser.timeout = 0
 
         # Track timing for inactivity detection
-        last_data_time = time.monotonic()
+        last_data_ns = time.monotonic_ns()
         idle_zero_posted = False
+        last_flush_ns = time.monotonic_ns()
+
+        rx = RxBuffer()
+        fmt_line = line_protocol_formatter(sensor_name)
+        prefix = line_protocol_prefix(sensor_name)
+        log_samples = logging.getLogger().isEnabledFor(logging.INFO)
 
         while True:
             try:
-                line = ser.readline().decode("utf-8", errors="replace").strip()
-
-                # If no data arrived within the serial timeout, consider posting zeros
-                if not line:
-                    now = time.monotonic()
-                    if (now - last_data_time) >= 1.0 and not idle_zero_posted:
-                        zero_data = {"x": 0, "y": 0, "z": 0}
+                raw = rx.pop_line()
+                if raw is None:
+                    # Sleep until bytes arrive or the next idle/flush deadline,
+                    # then take everything buffered
+                    timeout = _seconds_until(
+                        None if idle_zero_posted else last_data_ns + IDLE_NS,
+                        last_flush_ns + FLUSH_INTERVAL_NS if buf else None,
+                    )
+                    if select.select([ser], [], [], timeout)[0]:
+                        rx.extend(ser.read(ser.in_waiting or 1))
+                        raw = rx.pop_line()
+
+                # If no data arrived before a deadline, consider posting zeros
+                if not raw or raw.isspace():
+                    now_ns = time.monotonic_ns()
+                    if (now_ns - last_data_ns) >= IDLE_NS and not idle_zero_posted:
                         logging.info(
                             "Inactivity >1s detected; posting zeros: x=0, y=0, z=0"
                         )
                         if push_to_influx:
-                            try:
-                                push_to_influxdb(
-                                    zero_data,
-                                    sensor_name=sensor_name,
-                                    bucket=INFLUXDB_BUCKET,
-                                    org=INFLUXDB_ORG,
-                                    token=INFLUXDB_TOKEN,
-                                    influxdb_url=INFLUXDB_URL,
-                                )
-                                logging.debug("Posted zero values to InfluxDB")
-                            except Exception as e:
-                                logging.error(
-                                    f"Failed to push zero values to InfluxDB: {e}"
-                                )
+                            buf.append(fmt_line(0, 0, 0, time.time_ns()).encode())
                         idle_zero_posted = True
+                    # Don't hold pending points back while the stream is quiet
+                    if buf and (now_ns - last_flush_ns) >= FLUSH_INTERVAL_NS:
+                        queue_batch(write_q, buf)
+                        last_flush_ns = now_ns
                     continue
 
-                # Skip non-JSON lines (status messages, etc.)
-                if not line.startswith("{"):
-                    logging.debug(f"Status: {line}")
+                # Skip non-JSON lines (status messages, etc.); samples stay bytes
+                # and are only decoded for log output
+                if raw[:1] != b"{":
+                    logging.debug("Status: %s", _decode(raw))
                     continue
 
-                # Parse JSON data
-                try:
-                    data = json.loads(line)
-                except json.JSONDecodeError as e:
-                    logging.warning(f"JSON decode error: {e} in line: {line}")
-                    continue
-
-                # Validate expected fields
-                if not all(k in data for k in ["x", "y", "z"]):
-                    logging.warning(f"Missing x/y/z fields in data: {data}")
-                    continue
-
-                logging.info(
-                    f"Received: x={data['x']:.2f}, y={data['y']:.2f}, z={data['z']:.2f}"
-                )
+                m = None if strict else SAMPLE_RE.fullmatch(raw)
+                if m is not None:
+                    x, y, z = m.groups()
+                    if log_samples:
+                        logging.info(
+                            "Received: x=%s, y=%s, z=%s",
+                            x.decode(),
+                            y.decode(),
+                            z.decode(),
+                        )
+                    line = b"%bx=%b,y=%b,z=%b %d" % (prefix, x, y, z, time.time_ns())
+                else:
+                    # Anything the fast path doesn't match goes through the JSON
+                    # parser, which also reports why a line is malformed
+                    try:
+                        data = json.loads(raw)
+                    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                        logging.warning(
+                            "JSON decode error: %s in line: %s", e, _decode(raw)
+                        )
+                        continue
+
+                    # Validate expected fields; the lazy log call and line
+                    # protocol formatting below both assume numbers, and line
+                    # protocol has no NaN/Infinity even though json.loads does
+                    if not all(_is_number(data.get(k)) for k in REQUIRED_FIELDS):
+                        logging.warning(
+                            "Missing or invalid x/y/z fields in data: %s", data
+                        )
+                        continue
+
+                    logging.info(
+                        "Received: x=%.2f, y=%.2f, z=%.2f",
+                        data["x"],
+                        data["y"],
+                        data["z"],
+                    )
+                    line = fmt_line(
+                        data["x"], data["y"], data["z"], time.time_ns()
+                    ).encode()
 
                 # Update inactivity tracking on valid data
-                last_data_time = time.monotonic()
+                last_data_ns = time.monotonic_ns()
                 idle_zero_posted = False
 
-                # Push to InfluxDB
+                # Queue for InfluxDB and flush when the batch is full or due
                 if push_to_influx:
-                    try:
-                        push_to_influxdb(
-                            data,
-                            sensor_name=sensor_name,
-                            bucket=INFLUXDB_BUCKET,
-                            org=INFLUXDB_ORG,
-                            token=INFLUXDB_TOKEN,
-                            influxdb_url=INFLUXDB_URL,
-                        )
-                        logging.debug("Pushed to InfluxDB")
-                    except Exception as e:
-                        logging.error(f"Failed to push to InfluxDB: {e}")
+                    buf.append(line)
+                    if (
+                        len(buf) >= BATCH_SIZE
+                        or (last_data_ns - last_flush_ns) >= FLUSH_INTERVAL_NS
+                    ):
+                        queue_batch(write_q, buf)
+                        last_flush_ns = last_data_ns
 
-            except UnicodeDecodeError as e:
-                logging.warning(f"Unicode decode error: {e}")
-                continue
             except KeyboardInterrupt:
                 raise
             except Exception as e:
-                logging.error(f"Error processing line: {e}")
+                logging.error("Error processing line: %s", e)
                 continue
 
     except serial.SerialException as e:
-        logging.error(f"Serial port error: {e}")
+        logging.error("Serial port error: %s", e)
         sys.exit(1)
     except KeyboardInterrupt:
         logging.info("Stopped by user")
     finally:
+        if writer is not None:
+            queue_batch(write_q, buf)
+            write_q.put(None)
+            writer.join(timeout=WRITER_JOIN_TIMEOUT)
         if ser is not None and ser.is_open:
             ser.close()
             logging.info("Serial port closed")
@@ -207,6 +444,11 @@ def main() -> None:
         action="store_true",
         help="Disable InfluxDB push (monitoring mode only)",
     )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Parse every sample with the JSON decoder (slower; for debugging)",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Enable verbose logging"
     )
@@ -242,6 +484,7 @@ def main() -> None:
         baudrate=args.baudrate,
         sensor_name=args.sensor_name,
         push_to_influx=not args.no_push,
+        strict=args.strict,
     )
 
 
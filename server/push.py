@@ -1,4 +1,8 @@
+import atexit
+import gzip
 import os
+import time
+from collections.abc import Callable
 from typing import Any
 
 import httpx
@@ -14,6 +18,20 @@ INFLUXDB_ORG = os.getenv("INFLUXDB_ORG", "home")
 INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET", "dazzo")
 INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN", "")
 
+# Measurement holding one point per sample with x/y/z fields
+MEASUREMENT = "acc"
+
+# Bodies smaller than this are sent uncompressed; gzip overhead outweighs the savings
+GZIP_MIN_BYTES = 256
+
+# Shared client so repeated writes reuse pooled TCP/TLS connections
+_CLIENT = httpx.Client(
+    timeout=5.0,
+    limits=httpx.Limits(max_keepalive_connections=4, max_connections=8),
+    headers={"User-Agent": "dazzo-monitor"},
+)
+atexit.register(_CLIENT.close)
+
 
 def push_to_adafruit_io(group_key: str, data: dict[str, Any]) -> None:
     """Push a value to the specified Adafruit IO group."""
@@ -27,41 +45,70 @@ def push_to_adafruit_io(group_key: str, data: dict[str, Any]) -> None:
     }
 
     payload = {"feeds": [{"key": k, "value": str(v)} for k, v in data.items()]}
-    response = httpx.post(url, headers=headers, json=payload)
+    response = _CLIENT.post(url, headers=headers, json=payload)
     response.raise_for_status()
 
 
-def to_influx_line_protocol(data: dict[str, Any], sensor_name: str) -> str:
-    """Convert data dict to valid InfluxDB line protocol."""
-    line_protocol_lines = []
-    for key, value in data.items():
-        if isinstance(value, str):
-            field = f'value="{value}"'
-        elif isinstance(value, (int, float)):
-            field = f"value={value}"
-        else:
-            continue  # skip unsupported types
-        line = f"{key},sensor={sensor_name} {field}"
-        line_protocol_lines.append(line)
-    return "\n".join(line_protocol_lines)
+def _escape_tag(value: str) -> str:
+    """Escape a line protocol tag value (commas, equals signs and spaces)."""
+    return value.replace(",", r"\,").replace("=", r"\=").replace(" ", r"\ ")
 
 
-def push_to_influxdb(
-    data: dict[str, Any],
-    sensor_name: str = "dazzo-monitor",
+def line_protocol_formatter(sensor_name: str) -> Callable[..., str]:
+    """Return a bound formatter fmt(x, y, z, ts_ns) for one sensor's line protocol points.
+
+    The measurement and escaped sensor tag are baked into the template once,
+    so the per-sample call only interpolates the fields and timestamp. Braces
+    in the tag are doubled so str.format keeps them literal.
+    """
+    tag = _escape_tag(sensor_name).replace("{", "{{").replace("}", "}}")
+    return (f"{MEASUREMENT},sensor={tag} " + "x={},y={},z={} {}").format
+
+
+def line_protocol_prefix(sensor_name: str) -> bytes:
+    """Return the encoded measurement and sensor tag that start each of a sensor's points."""
+    return f"{MEASUREMENT},sensor={_escape_tag(sensor_name)} ".encode()
+
+
+def to_influx_line_protocol(data: dict[str, Any], sensor_name: str, ts_ns: int) -> str:
+    """Convert an x/y/z sample to one InfluxDB line protocol point with a ns timestamp."""
+    return line_protocol_formatter(sensor_name)(data["x"], data["y"], data["z"], ts_ns)
+
+
+def write_to_influxdb(
+    lines: str | bytes,
     bucket: str = INFLUXDB_BUCKET,
     org: str = INFLUXDB_ORG,
     token: str = INFLUXDB_TOKEN,
     influxdb_url: str = INFLUXDB_URL,
 ) -> None:
-    """Push data to InfluxDB using the line protocol."""
+    """Write pre-formatted, ns-timestamped line protocol to InfluxDB in one request (gzipped if large)."""
 
     url = f"{influxdb_url}/api/v2/write"
-    params = {"bucket": bucket, "org": org, "precision": "s"}
+    params = {"bucket": bucket, "org": org, "precision": "ns"}
     headers = {
         "Authorization": f"Token {token}",
         "Content-Type": "text/plain; charset=utf-8",
     }
-    content = to_influx_line_protocol(data, sensor_name)
-    response = httpx.post(url, params=params, headers=headers, content=content)
+    content = lines.encode("utf-8") if isinstance(lines, str) else lines
+    if len(content) >= GZIP_MIN_BYTES:
+        content = gzip.compress(content, compresslevel=1)
+        headers["Content-Encoding"] = "gzip"
+    response = _CLIENT.post(url, params=params, headers=headers, content=content)
     response.raise_for_status()
+
+
+def push_to_influxdb(
+    data: dict[str, Any],
+    sensor_name: str = "dazzo-monitor",
+    bucket: str = INFLUXDB_BUCKET,
+    org: str = INFLUXDB_ORG,
+    token: str = INFLUXDB_TOKEN,
+    influxdb_url: str = INFLUXDB_URL,
+) -> None:
+    """Push a single x/y/z sample to InfluxDB, timestamped now."""
+
+    lines = to_influx_line_protocol(data, sensor_name, time.time_ns())
+    write_to_influxdb(
+        lines, bucket=bucket, org=org, token=token, influxdb_url=influxdb_url
+    )
@@ -5,15 +5,33 @@
 #include <Adafruit_Sensor.h>
 #include "config.h"
 
+// Per-sample serial logging; off by default so the battery build skips formatting
+// and USB CDC writes in the loop. Set to 1 to see each sample in the Serial Monitor.
+#define DEBUG 0
+
+#if DEBUG
+#define DEBUG_PRINTF(...) Serial.printf(__VA_ARGS__)
+#define DEBUG_PRINTLN(msg) Serial.println(msg)
+#else
+#define DEBUG_PRINTF(...)
+#define DEBUG_PRINTLN(msg)
+#endif
+
 // BNO055 setup
 Adafruit_BNO055 bno = Adafruit_BNO055(55, 0x28);
 
 // Thresholds
 const float MIN_TRANSMISSION_THRESHOLD = 1;
+// Compared against the squared magnitude so the sqrt is only taken for samples we send
+const float MIN_TRANSMISSION_THRESHOLD_SQ = MIN_TRANSMISSION_THRESHOLD * MIN_TRANSMISSION_THRESHOLD;
 const unsigned long MIN_SEND_INTERVAL = 60000; // 1 minute in milliseconds
 
+// Sampling period; loop wakes on fixed deadlines so I2C/ESP-NOW time doesn't add drift
+const unsigned long SAMPLE_INTERVAL = 500; // milliseconds
+
 // Timing
 unsigned long lastSendTime = 0;
+unsigned long nextSampleTime = 0;
 
 // Structure to send
 typedef struct {
@@ -47,29 +65,38 @@ void setup() {
   peerInfo.channel = 0;
   peerInfo.encrypt = false;
   esp_now_add_peer(&peerInfo);
+
+  nextSampleTime = millis();
 }
 
 void loop() {
   imu::Vector<3> acc = bno.getVector(Adafruit_BNO055::VECTOR_LINEARACCEL);
   float x = acc.x(), y = acc.y(), z = acc.z();
-  float magnitude = sqrt(x*x + y*y + z*z);
+  float magnitudeSq = x*x + y*y + z*z;
 
   unsigned long currentTime = millis();
-  bool shouldSend = (magnitude >= MIN_TRANSMISSION_THRESHOLD) || 
+  bool shouldSend = (magnitudeSq >= MIN_TRANSMISSION_THRESHOLD_SQ) || 
                     (currentTime - lastSendTime >= MIN_SEND_INTERVAL);
 
   if (shouldSend) {
     SensorData data = {x, y, z};
     esp_err_t result = esp_now_send(peerAddress, (uint8_t*)&data, sizeof(data));
     if (result == ESP_OK) {
-      Serial.printf("Sent: %.2f, %.2f, %.2f (mag: %.2f)\n", x, y, z, magnitude);
+      DEBUG_PRINTF("Sent: %.2f, %.2f, %.2f (mag: %.2f)\n", x, y, z, sqrt(magnitudeSq));
       lastSendTime = currentTime;
     } else {
-      Serial.println("Send failed");
+      DEBUG_PRINTLN("Send failed");
     }
   } else {
-    Serial.println("Below threshold, not sending");
+    DEBUG_PRINTLN("Below threshold, not sending");
   }
 
-  delay(500); // small delay between readings
+  // Sleep until the next sample deadline; resync if we fell behind
+  nextSampleTime += SAMPLE_INTERVAL;
+  long remaining = (long)(nextSampleTime - millis());
+  if (remaining > 0) {
+    delay(remaining);
+  } else {
+    nextSampleTime = millis();
+  }
 }